@@ -6,17 +6,76 @@ AI整合助手 - 命令行接口
 
 import asyncio
 import argparse
-import json
-import sys
+import contextlib
+import functools
+import io
 import os
+import sys
+import traceback
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
+from dataclasses import dataclass
 
-# 添加src目录到路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+import aiofiles
 
-from src.ai_service_manager import AIServiceManager, setup_ai_service, list_ai_services
+from src.ai_service_manager import AIResponse, setup_ai_service, list_ai_services
 from src.output_formatter import AIIntegrationAgent, OutputFormatter
+from src import json_codec
+from src import event_loop
+
+
+# 文件扩展名到语言的映射
+_EXT_MAP: Dict[str, str] = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.java': 'java',
+    '.cpp': 'cpp',
+    '.c': 'c',
+    '.cs': 'csharp',
+    '.php': 'php',
+    '.rb': 'ruby',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.scala': 'scala',
+    '.sh': 'bash',
+    '.sql': 'sql',
+    '.html': 'html',
+    '.css': 'css',
+    '.json': 'json',
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.xml': 'xml',
+    '.md': 'markdown'
+}
+
+# 守护进程套接字路径
+DAEMON_SOCKET = Path(".claude") / "daemon.sock"
+
+# 固定的界面文本，每条合并为一次写入
+_MSG_CONFIG_MISSING = (
+    "❌ AI服务配置文件不存在，请先运行初始化命令\n"
+    "   python ai_assistant_cli.py init\n"
+)
+_MSG_INIT_EXISTS = "⚠️  配置文件已存在，使用 --force 强制重新初始化\n"
+_MSG_INIT_FORCE = "🔄 强制重新初始化配置文件...\n"
+_MSG_INIT_START = "🚀 初始化AI整合助手配置...\n"
+_MSG_INIT_NEXT_STEPS = (
+    "\n📝 下一步操作:\n"
+    "   1. 配置AI服务: python ai_assistant_cli.py config <service> <api_key>\n"
+    "   2. 查看服务状态: python ai_assistant_cli.py list\n"
+    "   3. 开始使用: python ai_assistant_cli.py analyze <content>\n"
+)
+
+
+@dataclass
+class ProbeResult:
+    """单个服务的连接测试结果"""
+    service_name: str
+    model_name: Optional[str]
+    response: Optional[AIResponse]
 
 
 class AIAssistantCLI:
@@ -26,36 +85,61 @@ class AIAssistantCLI:
         self.config_dir = Path(".claude")
         self.services_config = self.config_dir / "ai-services-config.json"
         self.style_config = self.config_dir / "output-styles" / "AI整合助手.json"
+        self._config_cache: Optional[Dict[str, Any]] = None
+        self._config_mtime = 0
+        self._config_present = False
+        # 守护进程模式下常驻的AI整合助手实例
+        self.agent: Optional[AIIntegrationAgent] = None
+    
+    @contextlib.asynccontextmanager
+    async def _agent_session(self):
+        """获取AI整合助手：有常驻实例时直接复用，否则创建临时实例"""
+        if self.agent is not None:
+            yield self.agent
+        else:
+            async with AIIntegrationAgent() as agent:
+                yield agent
+    
+    def _load_config(self) -> Dict[str, Any]:
+        """加载AI服务配置，文件未修改时直接返回缓存"""
+        mtime = self.services_config.stat().st_mtime_ns
+        if self._config_cache is not None and mtime == self._config_mtime:
+            return self._config_cache
+        
+        self._config_cache = json_codec.load_file(self.services_config)
+        self._config_mtime = mtime
+        return self._config_cache
     
     def ensure_config_exists(self):
-        """确保配置文件存在"""
+        """确保配置文件存在（确认存在后不再重复检查）"""
+        if self._config_present:
+            return
+        
         if not self.services_config.exists():
-            print("❌ AI服务配置文件不存在，请先运行初始化命令")
-            print("   python ai_assistant_cli.py init")
+            sys.stdout.write(_MSG_CONFIG_MISSING)
             sys.exit(1)
+        self._config_present = True
     
     def cmd_init(self, args):
         """初始化配置"""
+        self._config_present = False
         self.config_dir.mkdir(exist_ok=True)
         (self.config_dir / "output-styles").mkdir(exist_ok=True)
         
         if self.services_config.exists() and not args.force:
-            print("⚠️  配置文件已存在，使用 --force 强制重新初始化")
+            sys.stdout.write(_MSG_INIT_EXISTS)
             return
         
         # 检查是否已有配置文件（避免覆盖）
         if self.services_config.exists():
-            print("🔄 强制重新初始化配置文件...")
+            sys.stdout.write(_MSG_INIT_FORCE)
         else:
-            print("🚀 初始化AI整合助手配置...")
+            sys.stdout.write(_MSG_INIT_START)
         
         print("✅ 配置文件已创建")
         print(f"   - AI服务配置: {self.services_config}")
         print(f"   - 输出样式配置: {self.style_config}")
-        print("\n📝 下一步操作:")
-        print("   1. 配置AI服务: python ai_assistant_cli.py config <service> <api_key>")
-        print("   2. 查看服务状态: python ai_assistant_cli.py list")
-        print("   3. 开始使用: python ai_assistant_cli.py analyze <content>")
+        sys.stdout.write(_MSG_INIT_NEXT_STEPS)
     
     def cmd_config(self, args):
         """配置AI服务"""
@@ -64,25 +148,20 @@ class AIAssistantCLI:
         service_name = args.service
         api_key = args.api_key
         
-        success = setup_ai_service(service_name, api_key)
+        success, config = setup_ai_service(service_name, api_key)
         if success:
             print(f"✅ 成功配置 {service_name} 服务")
             print(f"🔑 API密钥: {api_key[:10]}...")
             
             # 显示可用模型
             try:
-                with open(self.services_config, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                if config is None:
+                    config = self._load_config()
                 
-                models = list(config['services'][service_name]['models'].keys())
-                free_models = [
-                    m for m, info in config['services'][service_name]['models'].items() 
-                    if info.get('type') == 'free'
-                ]
+                models = config['services'][service_name]['models']
                 
                 print(f"📋 可用模型 ({len(models)}个):")
-                for model in models:
-                    model_info = config['services'][service_name]['models'][model]
+                for model, model_info in models.items():
                     model_type = "🆓 免费" if model_info.get('type') == 'free' else "💰 付费"
                     print(f"   - {model} ({model_type})")
                 
@@ -95,12 +174,11 @@ class AIAssistantCLI:
         """列出AI服务状态"""
         self.ensure_config_exists()
         
-        print("🤖 AI整合助手 - 服务状态")
-        print("=" * 50)
+        # 先收集全部输出行，最后一次性写出
+        lines = ["🤖 AI整合助手 - 服务状态", "=" * 50]
         
         try:
-            with open(self.services_config, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config = self._load_config()
             
             enabled_count = 0
             total_count = len(config['services'])
@@ -117,30 +195,32 @@ class AIAssistantCLI:
                 else:
                     status = "❌ 未配置"
                 
-                print(f"\n📡 {service_config['name']} ({service_name})")
-                print(f"   状态: {status}")
-                print(f"   API地址: {service_config['api_base']}")
+                lines.append(f"\n📡 {service_config['name']} ({service_name})")
+                lines.append(f"   状态: {status}")
+                lines.append(f"   API地址: {service_config['api_base']}")
                 
                 # 显示模型信息
                 models = service_config.get('models', {})
-                free_count = len([m for m in models.values() if m.get('type') == 'free'])
+                free_count = sum(1 for m in models.values() if m.get('type') == 'free')
                 paid_count = len(models) - free_count
-                print(f"   模型: {len(models)}个 (免费: {free_count}, 付费: {paid_count})")
+                lines.append(f"   模型: {len(models)}个 (免费: {free_count}, 付费: {paid_count})")
                 
                 if has_key and args.verbose:
                     key_preview = service_config['api_key'][:10] + "..." if service_config['api_key'] else "无"
-                    print(f"   API密钥: {key_preview}")
+                    lines.append(f"   API密钥: {key_preview}")
             
-            print("\n" + "=" * 50)
-            print(f"📊 总计: {enabled_count}/{total_count} 个服务已启用")
+            lines.append("\n" + "=" * 50)
+            lines.append(f"📊 总计: {enabled_count}/{total_count} 个服务已启用")
             
             if enabled_count == 0:
-                print("\n💡 提示: 使用以下命令配置AI服务:")
-                print("   python ai_assistant_cli.py config zhipu <your_api_key>")
-                print("   python ai_assistant_cli.py config silicon <your_api_key>")
+                lines.append("\n💡 提示: 使用以下命令配置AI服务:")
+                lines.append("   python ai_assistant_cli.py config zhipu <your_api_key>")
+                lines.append("   python ai_assistant_cli.py config silicon <your_api_key>")
             
         except Exception as e:
-            print(f"❌ 读取配置失败: {e}")
+            lines.append(f"❌ 读取配置失败: {e}")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
     
     async def cmd_analyze(self, args):
         """分析内容"""
@@ -163,7 +243,7 @@ class AIAssistantCLI:
         print(f"📝 内容长度: {len(content)} 字符")
         
         try:
-            async with AIIntegrationAgent() as agent:
+            async with self._agent_session() as agent:
                 # 检查可用服务
                 status = agent.get_service_status()
                 available = status['available_services']
@@ -176,23 +256,14 @@ class AIAssistantCLI:
                 print(f"🚀 使用 {len(available)} 个AI服务进行分析: {', '.join(available)}")
                 
                 # 执行分析
-                result = await agent.general_analysis(content)
+                await self._stream_result(agent.general_analysis_stream(content), args.save)
                 
-                print("\n" + "=" * 60)
-                print(result.content)
-                print("=" * 60)
-                
-                # 保存分析结果
                 if args.save:
-                    output_file = args.save
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(result.content)
-                    print(f"\n💾 分析结果已保存到: {output_file}")
+                    print(f"\n💾 分析结果已保存到: {args.save}")
                 
         except Exception as e:
             print(f"❌ 分析失败: {e}")
             if args.verbose:
-                import traceback
                 traceback.print_exc()
     
     async def cmd_code_review(self, args):
@@ -203,8 +274,8 @@ class AIAssistantCLI:
         language = args.language or self._detect_language(code_file)
         
         try:
-            with open(code_file, 'r', encoding='utf-8') as f:
-                code = f.read()
+            async with aiofiles.open(code_file, 'r', encoding='utf-8') as f:
+                code = await f.read()
         except FileNotFoundError:
             print(f"❌ 文件未找到: {code_file}")
             return
@@ -213,26 +284,19 @@ class AIAssistantCLI:
             return
         
         print(f"🔍 开始代码审查: {code_file}")
-        print(f"📝 语言: {language}, 行数: {code.count(chr(10)) + 1}")
+        line_count = code.count('\n') + 1
+        print(f"📝 语言: {language}, 行数: {line_count}")
         
         try:
-            async with AIIntegrationAgent() as agent:
-                result = await agent.analyze_code(code, language)
-                
-                print("\n" + "=" * 60)
-                print(result.content)
-                print("=" * 60)
+            async with self._agent_session() as agent:
+                await self._stream_result(agent.analyze_code_stream(code, language), args.save)
                 
                 if args.save:
-                    output_file = args.save
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(result.content)
-                    print(f"\n💾 审查结果已保存到: {output_file}")
+                    print(f"\n💾 审查结果已保存到: {args.save}")
                 
         except Exception as e:
             print(f"❌ 代码审查失败: {e}")
             if args.verbose:
-                import traceback
                 traceback.print_exc()
     
     async def cmd_error_analysis(self, args):
@@ -246,8 +310,8 @@ class AIAssistantCLI:
         code = ""
         if code_file:
             try:
-                with open(code_file, 'r', encoding='utf-8') as f:
-                    code = f.read()
+                async with aiofiles.open(code_file, 'r', encoding='utf-8') as f:
+                    code = await f.read()
                 language = language or self._detect_language(code_file)
             except Exception as e:
                 print(f"⚠️  读取代码文件失败: {e}")
@@ -258,106 +322,104 @@ class AIAssistantCLI:
             print(f"📝 相关代码: {len(code)} 字符")
         
         try:
-            async with AIIntegrationAgent() as agent:
-                result = await agent.analyze_error(error_message, code, language or "text")
-                
-                print("\n" + "=" * 60)
-                print(result.content)
-                print("=" * 60)
+            async with self._agent_session() as agent:
+                await self._stream_result(agent.analyze_error_stream(error_message, code, language or "text"), args.save)
                 
                 if args.save:
-                    output_file = args.save
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(result.content)
-                    print(f"\n💾 错误分析结果已保存到: {output_file}")
+                    print(f"\n💾 错误分析结果已保存到: {args.save}")
                 
         except Exception as e:
             print(f"❌ 错误分析失败: {e}")
             if args.verbose:
-                import traceback
                 traceback.print_exc()
     
-    def cmd_test(self, args):
+    async def cmd_test(self, args):
         """测试配置"""
         self.ensure_config_exists()
         
         print("🧪 测试AI服务连接...")
         
-        async def run_test():
-            try:
-                async with AIServiceManager() as manager:
-                    available_services = manager.get_available_services()
-                    
-                    if not available_services:
-                        print("❌ 没有可用的AI服务")
-                        return
+        try:
+            async with self._agent_session() as agent:
+                manager = agent.service_manager
+                available_services = manager.get_available_services()
+                
+                if not available_services:
+                    print("❌ 没有可用的AI服务")
+                    return
+                
+                print(f"📡 测试 {len(available_services)} 个服务...")
+                
+                test_prompt = "Hello, please respond with 'Connection successful' in Chinese."
+                
+                async def probe(service_name: str) -> ProbeResult:
+                    models = manager.get_service_models(service_name)
+                    if not models:
+                        return ProbeResult(service_name, None, None)
                     
-                    print(f"📡 测试 {len(available_services)} 个服务...")
+                    model_name = models[0]  # 使用第一个模型测试
+                    # 连通性测试必须真正发起请求，不能命中缓存结果
+                    response = await manager.call_ai_service(
+                        service_name, model_name, test_prompt, use_cache=False
+                    )
+                    return ProbeResult(service_name, model_name, response)
+                
+                # 并发测试所有服务，结果按服务顺序输出
+                results = await asyncio.gather(
+                    *(probe(service_name) for service_name in available_services),
+                    return_exceptions=True
+                )
+                
+                for service_name, result in zip(available_services, results):
+                    if isinstance(result, Exception):
+                        print(f"   {service_name}: ❌ 失败: {result}")
+                        continue
                     
-                    test_prompt = "Hello, please respond with 'Connection successful' in Chinese."
+                    if result.response is None:
+                        print(f"   {service_name}: ❌ 没有可用模型")
+                        continue
                     
-                    for service_name in available_services:
-                        models = manager.get_service_models(service_name)
-                        if models:
-                            model_name = models[0]  # 使用第一个模型测试
-                            
-                            print(f"   测试 {service_name} ({model_name})...", end="")
-                            
-                            response = await manager.call_ai_service(
-                                service_name, model_name, test_prompt
-                            )
-                            
-                            if response.success:
-                                print(f" ✅ 成功 ({response.response_time:.2f}s)")
-                                if args.verbose:
-                                    print(f"      响应: {response.content[:50]}...")
-                            else:
-                                print(f" ❌ 失败: {response.error_message}")
-                        else:
-                            print(f"   {service_name}: ❌ 没有可用模型")
-            
-            except Exception as e:
-                print(f"❌ 测试失败: {e}")
-                if args.verbose:
-                    import traceback
-                    traceback.print_exc()
+                    print(f"   测试 {service_name} ({result.model_name})...", end="")
+                    response = result.response
+                    if response.success:
+                        print(f" ✅ 成功 ({response.response_time:.2f}s)")
+                        if args.verbose:
+                            print(f"      响应: {response.content[:50]}...")
+                    else:
+                        print(f" ❌ 失败: {response.error_message}")
         
-        asyncio.run(run_test())
+        except Exception as e:
+            print(f"❌ 测试失败: {e}")
+            if args.verbose:
+                traceback.print_exc()
+    
+    async def _stream_result(self, sections: AsyncIterator[str], output_file: Optional[str] = None):
+        """逐段输出分析结果，并同时写入保存文件"""
+        print("\n" + "=" * 60)
+        
+        save_file = None
+        try:
+            async for section in sections:
+                sys.stdout.write(section)
+                if output_file:
+                    # 拿到第一段结果后再创建文件，分析失败时不留下空文件
+                    if save_file is None:
+                        save_file = await aiofiles.open(output_file, 'w', encoding='utf-8')
+                    await save_file.write(section)
+        finally:
+            if save_file is not None:
+                await save_file.close()
+        
+        print("\n" + "=" * 60)
     
     def _detect_language(self, filename: str) -> str:
         """检测文件语言"""
-        ext_map = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.ts': 'typescript',
-            '.java': 'java',
-            '.cpp': 'cpp',
-            '.c': 'c',
-            '.cs': 'csharp',
-            '.php': 'php',
-            '.rb': 'ruby',
-            '.go': 'go',
-            '.rs': 'rust',
-            '.swift': 'swift',
-            '.kt': 'kotlin',
-            '.scala': 'scala',
-            '.sh': 'bash',
-            '.sql': 'sql',
-            '.html': 'html',
-            '.css': 'css',
-            '.json': 'json',
-            '.yaml': 'yaml',
-            '.yml': 'yaml',
-            '.xml': 'xml',
-            '.md': 'markdown'
-        }
-        
-        ext = Path(filename).suffix.lower()
-        return ext_map.get(ext, 'text')
+        return _EXT_MAP.get(Path(filename).suffix.lower(), 'text')
 
 
+@functools.lru_cache(maxsize=1)
 def create_parser():
-    """创建命令行参数解析器"""
+    """创建命令行参数解析器（进程内只构建一次）"""
     parser = argparse.ArgumentParser(
         description="AI整合助手 - 多AI服务协作分析工具",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -384,10 +446,15 @@ def create_parser():
   
   # 测试服务连接
   python ai_assistant_cli.py test
+  
+  # 守护进程模式（批量调用时省去启动开销）
+  python ai_assistant_cli.py daemon
+  python ai_assistant_cli.py --use-daemon code-review src/main.py
         """
     )
     
     parser.add_argument('-v', '--verbose', action='store_true', help='详细输出')
+    parser.add_argument('--use-daemon', action='store_true', help='将命令转发给已启动的守护进程执行')
     
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
     
@@ -429,20 +496,14 @@ def create_parser():
     test_parser = subparsers.add_parser('test', help='测试AI服务连接')
     test_parser.add_argument('-v', '--verbose', action='store_true', help='显示详细信息')
     
+    # daemon 命令
+    subparsers.add_parser('daemon', help='启动常驻守护进程，供 --use-daemon 调用')
+    
     return parser
 
 
-async def main():
-    """主函数"""
-    parser = create_parser()
-    args = parser.parse_args()
-    
-    if not args.command:
-        parser.print_help()
-        return
-    
-    cli = AIAssistantCLI()
-    
+async def run_command(cli: AIAssistantCLI, parser: argparse.ArgumentParser, args):
+    """执行已解析的命令"""
     try:
         if args.command == 'init':
             cli.cmd_init(args)
@@ -457,7 +518,7 @@ async def main():
         elif args.command == 'error':
             await cli.cmd_error_analysis(args)
         elif args.command == 'test':
-            cli.cmd_test(args)
+            await cli.cmd_test(args)
         else:
             parser.print_help()
     
@@ -466,10 +527,152 @@ async def main():
     except Exception as e:
         print(f"❌ 执行失败: {e}")
         if args.verbose:
-            import traceback
             traceback.print_exc()
 
 
+async def serve_daemon(socket_path: Path = DAEMON_SOCKET):
+    """
+    启动守护进程，通过UNIX套接字接收命令
+    
+    常驻的AI整合助手在请求之间保持HTTP会话和配置缓存，请求按到达顺序逐个处理。
+    """
+    if not hasattr(asyncio, 'start_unix_server'):
+        print("❌ 当前平台不支持守护进程模式")
+        return
+    
+    parser = create_parser()
+    cli = AIAssistantCLI()
+    cli.ensure_config_exists()
+    lock = asyncio.Lock()
+    config_mtime = None
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        nonlocal config_mtime
+        try:
+            request = json_codec.loads(await reader.readline())
+            output = io.StringIO()
+            exit_code = 0
+            
+            async with lock:
+                original_cwd = os.getcwd()
+                original_stdin = sys.stdin
+                try:
+                    os.chdir(request.get('cwd', original_cwd))
+                    sys.stdin = io.StringIO(request.get('stdin', ''))
+                    
+                    # 配置文件变更后重建常驻实例
+                    mtime = cli.services_config.stat().st_mtime_ns
+                    if mtime != config_mtime:
+                        if cli.agent is not None:
+                            await cli.agent.__aexit__(None, None, None)
+                        cli.agent = await AIIntegrationAgent().__aenter__()
+                        config_mtime = mtime
+                    
+                    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                        try:
+                            args = parser.parse_args(request['argv'])
+                            await run_command(cli, parser, args)
+                        except SystemExit as e:
+                            exit_code = e.code if isinstance(e.code, int) else 1
+                finally:
+                    sys.stdin = original_stdin
+                    os.chdir(original_cwd)
+            
+            response = {"output": output.getvalue(), "exit_code": exit_code}
+        except Exception as e:
+            response = {"output": f"❌ 守护进程处理失败: {e}\n", "exit_code": 1}
+        
+        writer.write(json_codec.encode(response) + b"\n")
+        await writer.drain()
+        writer.close()
+    
+    server = await asyncio.start_unix_server(handle, path=str(socket_path))
+    print(f"🛰️  守护进程已启动: {socket_path}")
+    print("   使用 python ai_assistant_cli.py --use-daemon <command> 发送命令，Ctrl+C 退出")
+    
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if cli.agent is not None:
+            await cli.agent.__aexit__(None, None, None)
+        with contextlib.suppress(FileNotFoundError):
+            socket_path.unlink()
+
+
+async def send_to_daemon(argv: List[str], stdin: str = "", socket_path: Path = DAEMON_SOCKET) -> Optional[int]:
+    """
+    将命令转发给守护进程执行
+    
+    Args:
+        argv: 命令行参数（不含 --use-daemon）
+        stdin: 转发给命令的标准输入内容
+        socket_path: 守护进程套接字路径
+        
+    Returns:
+        Optional[int]: 命令退出码；守护进程不可用时返回None
+    """
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+    except (OSError, AttributeError):
+        return None
+    
+    request = {"argv": argv, "cwd": os.getcwd(), "stdin": stdin}
+    data = json_codec.encode(request) + b"\n"
+    try:
+        writer.write(data)
+        await writer.drain()
+        line = await reader.readline()
+    except OSError:
+        # 连接中断，视为守护进程不可用
+        return None
+    finally:
+        writer.close()
+    
+    # 未回复或回复格式错误，同样视为守护进程不可用
+    try:
+        response = json_codec.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(response, dict) or "output" not in response or "exit_code" not in response:
+        return None
+    
+    sys.stdout.write(response["output"])
+    return response["exit_code"]
+
+
+async def main():
+    """主函数"""
+    parser = create_parser()
+    args = parser.parse_args()
+    
+    if not args.command:
+        parser.print_help()
+        return
+    
+    if args.command == 'daemon':
+        await serve_daemon()
+        return
+    
+    if args.use_daemon:
+        argv = [arg for arg in sys.argv[1:] if arg != '--use-daemon']
+        stdin = ""
+        if args.command == 'analyze' and not args.content and not sys.stdin.isatty():
+            stdin = sys.stdin.read()
+        exit_code = await send_to_daemon(argv, stdin)
+        if exit_code is not None:
+            if exit_code:
+                sys.exit(exit_code)
+            return
+        print("⚠️  守护进程未运行，改为直接执行", file=sys.stderr)
+        if stdin:
+            # 标准输入已被读取，还原给本地执行的命令
+            sys.stdin = io.StringIO(stdin)
+    
+    cli = AIAssistantCLI()
+    await run_command(cli, parser, args)
+
+
 if __name__ == "__main__":
     # 检查依赖
     try:
@@ -478,4 +681,7 @@ if __name__ == "__main__":
         print("❌ 缺少依赖: pip install aiohttp")
         sys.exit(1)
     
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        event_loop.run(main())
+    except KeyboardInterrupt:
+        print("\n⚠️  用户中断操作")
\ No newline at end of file
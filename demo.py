@@ -5,69 +5,60 @@ AI整合助手演示脚本
 """
 
 import asyncio
+import argparse
+import io
 import sys
+import traceback
 import os
+from contextvars import ContextVar
+from typing import Optional
 
-# 添加src目录到路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-
-from src.ai_service_manager import AIServiceManager
+from src import event_loop
 from src.output_formatter import AIIntegrationAgent, OutputFormatter
 
 
-async def demo_basic_usage():
+async def demo_basic_usage(agent: AIIntegrationAgent):
     """基本使用演示"""
     print("🚀 AI整合助手基本使用演示")
     print("=" * 50)
     
-    # 检查配置文件是否存在
-    config_path = ".claude/ai-services-config.json"
-    if not os.path.exists(config_path):
-        print("❌ 配置文件不存在，请先运行:")
-        print("   python ai_assistant_cli.py init")
-        print("   python ai_assistant_cli.py config zhipu <your-api-key>")
-        return
-    
     try:
-        # 创建AI整合助手实例
-        async with AIIntegrationAgent() as agent:
-            
-            # 获取服务状态
-            status = agent.get_service_status()
-            print(f"📊 服务状态:")
-            print(f"   可用服务: {len(status['available_services'])}/{status['total_services']}")
-            print(f"   服务列表: {', '.join(status['available_services'])}")
-            
-            if not status['available_services']:
-                print("❌ 没有可用的AI服务，请先配置")
-                print("   python ai_assistant_cli.py config zhipu <your-api-key>")
-                return
-            
-            print(f"   免费模型: {status['free_models']}")
-            print()
-            
-            # 演示1: 通用文本分析
-            print("📝 演示1: 通用文本分析")
-            print("-" * 30)
-            
-            sample_text = """
-            Python是一种高级编程语言，以其简洁易读的语法而闻名。
-            它广泛应用于Web开发、数据科学、人工智能等领域。
-            Python的哲学是"优雅"、"明确"、"简单"。
-            """
-            
-            print(f"分析内容: {sample_text.strip()}")
-            print("\n🔍 开始分析...")
-            
-            result = await agent.general_analysis(sample_text)
-            print(result.content)
-            print("\n" + "=" * 50 + "\n")
-            
-            # 演示2: 代码分析
-            print("🔧 演示2: 代码分析")
-            print("-" * 30)
-            
-            sample_code = '''
+        # 获取服务状态
+        status = agent.get_service_status()
+        print(f"📊 服务状态:")
+        print(f"   可用服务: {len(status['available_services'])}/{status['total_services']}")
+        print(f"   服务列表: {', '.join(status['available_services'])}")
+        
+        if not status['available_services']:
+            print("❌ 没有可用的AI服务，请先配置")
+            print("   python ai_assistant_cli.py config zhipu <your-api-key>")
+            return
+        
+        print(f"   免费模型: {status['free_models']}")
+        print()
+        
+        # 演示1: 通用文本分析
+        print("📝 演示1: 通用文本分析")
+        print("-" * 30)
+        
+        sample_text = """
+        Python是一种高级编程语言，以其简洁易读的语法而闻名。
+        它广泛应用于Web开发、数据科学、人工智能等领域。
+        Python的哲学是"优雅"、"明确"、"简单"。
+        """
+        
+        print(f"分析内容: {sample_text.strip()}")
+        print("\n🔍 开始分析...")
+        
+        result = await agent.general_analysis(sample_text)
+        print(result.content)
+        print("\n" + "=" * 50 + "\n")
+        
+        # 演示2: 代码分析
+        print("🔧 演示2: 代码分析")
+        print("-" * 30)
+        
+        sample_code = '''
 def fibonacci(n):
     if n <= 1:
         return n
@@ -75,43 +66,42 @@ def fibonacci(n):
 
 result = fibonacci(10)
 print(result)
-            '''
-            
-            print("分析代码:")
-            print(sample_code)
-            print("🔍 开始代码分析...")
-            
-            result = await agent.analyze_code(sample_code, "python")
-            print(result.content)
-            print("\n" + "=" * 50 + "\n")
-            
-            # 演示3: 错误分析
-            print("🐛 演示3: 错误分析")
-            print("-" * 30)
-            
-            error_msg = "IndexError: list index out of range"
-            error_code = '''
+        '''
+        
+        print("分析代码:")
+        print(sample_code)
+        print("🔍 开始代码分析...")
+        
+        result = await agent.analyze_code(sample_code, "python")
+        print(result.content)
+        print("\n" + "=" * 50 + "\n")
+        
+        # 演示3: 错误分析
+        print("🐛 演示3: 错误分析")
+        print("-" * 30)
+        
+        error_msg = "IndexError: list index out of range"
+        error_code = '''
 data = [1, 2, 3]
 for i in range(5):
     print(data[i])  # 这里会出错
-            '''
-            
-            print(f"错误信息: {error_msg}")
-            print("相关代码:")
-            print(error_code)
-            print("🔍 开始错误分析...")
-            
-            result = await agent.analyze_error(error_msg, error_code, "python")
-            print(result.content)
-            
+        '''
+        
+        print(f"错误信息: {error_msg}")
+        print("相关代码:")
+        print(error_code)
+        print("🔍 开始错误分析...")
+        
+        result = await agent.analyze_error(error_msg, error_code, "python")
+        print(result.content)
+        
     except Exception as e:
         print(f"❌ 演示失败: {e}")
-        import traceback
         traceback.print_exc()
 
 
-async def demo_output_formats():
-    """输出格式演示"""
+async def demo_output_formats(formatter: OutputFormatter):
+    """输出格式演示（使用模拟数据，无需配置AI服务）"""
     print("\n🎨 输出格式演示")
     print("=" * 50)
     
@@ -149,8 +139,6 @@ async def demo_output_formats():
         )
     ]
     
-    formatter = OutputFormatter()
-    
     # 演示不同的输出格式
     print("📋 表格格式:")
     table_result = formatter.format_for_claude_code(mock_responses, "table")
@@ -167,67 +155,141 @@ async def demo_output_formats():
     print(combined_result.content)
 
 
-async def demo_service_manager():
+async def demo_service_manager(agent: AIIntegrationAgent):
     """AI服务管理器演示"""
     print("\n🤖 AI服务管理器演示")  
     print("=" * 50)
     
     try:
-        async with AIServiceManager() as manager:
-            
-            # 获取服务信息
-            available = manager.get_available_services()
-            all_models = {}
-            free_models = manager.get_free_models()
-            
-            print(f"📡 可用服务: {available}")
-            print(f"🆓 免费模型: {free_models}")
-            
-            for service in available:
-                models = manager.get_service_models(service)
-                all_models[service] = models
-                print(f"   {service}: {models}")
-            
-            if not available:
-                print("❌ 没有可用服务，演示结束")
-                return
-            
-            # 测试单个服务调用
-            print(f"\n🧪 测试服务调用:")
-            service_name = available[0]
-            model_name = all_models[service_name][0]
-            
-            print(f"   调用 {service_name} ({model_name})...")
-            
-            response = await manager.call_ai_service(
-                service_name, 
-                model_name, 
-                "请简单介绍一下人工智能的发展历程"
-            )
-            
-            if response.success:
-                print(f"   ✅ 调用成功")
-                print(f"   📝 响应内容: {response.content[:100]}...")
-                print(f"   ⏱️  响应时间: {response.response_time:.2f}s")
-                print(f"   🎯 置信度: {response.confidence}/10")
-            else:
-                print(f"   ❌ 调用失败: {response.error_message}")
-            
+        manager = agent.service_manager
+        
+        # 获取服务信息
+        available = manager.get_available_services()
+        all_models = {}
+        free_models = manager.get_free_models()
+        
+        print(f"📡 可用服务: {available}")
+        print(f"🆓 免费模型: {free_models}")
+        
+        for service in available:
+            models = manager.get_service_models(service)
+            all_models[service] = models
+            print(f"   {service}: {models}")
+        
+        if not available:
+            print("❌ 没有可用服务，演示结束")
+            return
+        
+        # 测试单个服务调用
+        print(f"\n🧪 测试服务调用:")
+        service_name = available[0]
+        model_name = all_models[service_name][0]
+        
+        print(f"   调用 {service_name} ({model_name})...")
+        
+        response = await manager.call_ai_service(
+            service_name, 
+            model_name, 
+            "请简单介绍一下人工智能的发展历程"
+        )
+        
+        if response.success:
+            print(f"   ✅ 调用成功")
+            print(f"   📝 响应内容: {response.content[:100]}...")
+            print(f"   ⏱️  响应时间: {response.response_time:.2f}s")
+            print(f"   🎯 置信度: {response.confidence}/10")
+        else:
+            print(f"   ❌ 调用失败: {response.error_message}")
+        
     except Exception as e:
         print(f"❌ 服务管理器演示失败: {e}")
 
 
+# 当前演示任务的输出缓冲区，并发运行时各任务互不干扰
+_demo_output: ContextVar[Optional[io.StringIO]] = ContextVar('_demo_output', default=None)
+
+
+class _DemoStdout:
+    """stdout代理：写入当前任务的缓冲区，没有缓冲区时直接输出"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        buffer = _demo_output.get()
+        return (buffer or self._stream).write(text)
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+async def _capture_demo(demo) -> str:
+    """运行单个演示并返回其输出，异常不影响其他演示"""
+    buffer = io.StringIO()
+    _demo_output.set(buffer)
+    try:
+        await demo
+    except Exception as e:
+        print(f"❌ 演示失败: {e}")
+    return buffer.getvalue()
+
+
+async def run_all_demos(live: bool = False):
+    """
+    运行所有演示，共享同一个AI整合助手实例
+    
+    Args:
+        live: 为True时按顺序运行并实时输出；默认并发运行，输出缓冲后一次性写出
+    """
+    # 检查配置文件是否存在
+    config_path = ".claude/ai-services-config.json"
+    if not os.path.exists(config_path):
+        print("❌ 配置文件不存在，请先运行:")
+        print("   python ai_assistant_cli.py init")
+        print("   python ai_assistant_cli.py config zhipu <your-api-key>")
+        
+        # 输出格式演示只使用模拟数据，未配置时仍可运行
+        try:
+            await demo_output_formats(OutputFormatter())
+        except Exception as e:
+            print(f"❌ 演示失败: {e}")
+        return
+    
+    async with AIIntegrationAgent() as agent:
+        demos = (demo_basic_usage(agent), demo_output_formats(agent.formatter), demo_service_manager(agent))
+        
+        if live:
+            for demo in demos:
+                try:
+                    await demo
+                except Exception as e:
+                    print(f"❌ 演示失败: {e}")
+            return
+        
+        original_stdout = sys.stdout
+        sys.stdout = _DemoStdout(original_stdout)
+        try:
+            outputs = await asyncio.gather(*(_capture_demo(demo) for demo in demos))
+        finally:
+            sys.stdout = original_stdout
+    
+    sys.stdout.write("".join(outputs))
+    sys.stdout.flush()
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="AI整合助手演示脚本")
+    parser.add_argument('--live', action='store_true', help='按顺序运行演示并实时输出进度')
+    args = parser.parse_args()
+    
     print("🎪 AI整合助手完整演示")
     print("适用于Claude Code环境的多AI服务整合工具")
     print("=" * 60)
     
     try:
         # 运行所有演示
-        asyncio.run(demo_basic_usage())
-        asyncio.run(demo_output_formats())
-        asyncio.run(demo_service_manager())
+        event_loop.run(run_all_demos(live=args.live))
         
         print("\n🎉 演示完成！")
         print("\n📚 更多用法:")
@@ -0,0 +1,5 @@
+"""
+AI整合助手 - 多AI服务调用与输出格式化
+"""
+
+__version__ = "1.0.0"
@@ -6,16 +6,32 @@ AI Service Manager - 多AI服务调用封装类
 
 import json
 import asyncio
+import time
+import hashlib
+import functools
 import aiohttp
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from . import json_codec
+from collections import OrderedDict, deque
+from itertools import chain
+from typing import Dict, List, Optional, Any, Tuple, Deque
+from dataclasses import dataclass, replace
 import os
+import stat
+import sys
 from pathlib import Path
 
 
-@dataclass
+# 已解析的配置缓存: 绝对路径 -> (文件mtime, 配置)
+_CONFIG_CACHE: Dict[str, Tuple[int, Dict]] = {}
+
+
+# Python 3.10+ 的dataclass支持slots，实例不再分配__dict__
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class AIResponse:
-    """AI响应数据类"""
+    """AI响应数据类（不可变，可在缓存和并发调用方之间安全共享）"""
     service_name: str
     model_name: str
     content: str
@@ -26,44 +42,408 @@ class AIResponse:
     error_message: Optional[str] = None
 
 
+class _BlankFormatDict(dict):
+    """format_map 使用的参数字典，模板中未提供的占位符替换为空字符串"""
+    
+    def __missing__(self, key):
+        return ""
+
+
+# 每个管理器最多缓存的成功响应数
+_RESULT_CACHE_SIZE = 256
+
+
+class _InflightCall:
+    """进行中的共享请求及其等待方数量"""
+    __slots__ = ('task', 'waiters')
+    
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+def _error_response(service_name: str, model_name: str, message: str,
+                    response_time: float = 0.0) -> AIResponse:
+    """构建调用失败的AI响应"""
+    return AIResponse(service_name, model_name, "", 0.0, {}, response_time, False, message)
+
+
+# 响应表格的表头及表格单元格需要转义的字符
+_RESPONSE_TABLE_HEADER = (
+    "| AI服务 | 模型 | 分析结果 | 置信度 | 响应时间 |",
+    "|--------|------|----------|--------|----------|",
+)
+_TABLE_ESCAPE = str.maketrans({'\n': ' ', '|': '\\|'})
+
+
+def _response_table_row(response: AIResponse) -> str:
+    """生成单个AI响应的表格行"""
+    if not response.success:
+        return (f"| {response.service_name} | {response.model_name} | "
+                f"错误: {response.error_message} | 0/10 | {response.response_time:.2f}s |")
+    
+    # 截断内容以适应表格显示，并转义表格字符
+    content = response.content
+    if len(content) > 100:
+        content = content[:100] + "..."
+    
+    return (f"| {response.service_name} | {response.model_name} | {content.translate(_TABLE_ESCAPE)} | "
+            f"{response.confidence:.1f}/10 | {response.response_time:.2f}s |")
+
+
+class _TokenBucket:
+    """令牌桶限流器：按固定速率补充令牌，令牌不足时等待"""
+    __slots__ = ('capacity', 'rate', 'tokens', 'last')
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发量）
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.last = time.monotonic()
+    
+    async def acquire(self, cost: float = 1.0):
+        """获取令牌，不足时等待补充"""
+        cost = min(cost, self.capacity)
+        while True:
+            now = time.monotonic()
+            if now < self.last:
+                # 处于暂停期
+                await asyncio.sleep(self.last - now)
+                continue
+            
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return
+            
+            await asyncio.sleep((cost - self.tokens) / self.rate)
+    
+    def pause_until(self, deadline: float):
+        """清空令牌并暂停到指定时刻（time.monotonic() 时间）"""
+        self.tokens = 0.0
+        self.last = max(self.last, deadline)
+
+
+# 请求体模板中提示词的占位值
+_PROMPT_PLACEHOLDER = "\x00prompt\x00"
+
+
+class _PayloadBuilder:
+    """
+    单个模型的请求体构建器
+    
+    使用默认参数时，请求体由预先序列化的前后两段与编码后的提示词拼接而成。
+    """
+    __slots__ = ('model_name', 'temperature', 'max_tokens', 'prefix', 'suffix')
+    
+    def __init__(self, model_name: str, temperature: float, max_tokens: int):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.prefix, self.suffix = json_codec.encode(
+            self._payload(_PROMPT_PLACEHOLDER, temperature, max_tokens)
+        ).split(json_codec.encode(_PROMPT_PLACEHOLDER))
+    
+    def _payload(self, prompt: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+    
+    def build(self, prompt: str, temperature: float, max_tokens: int) -> bytes:
+        """生成请求体JSON字节串"""
+        if temperature == self.temperature and max_tokens == self.max_tokens:
+            return self.prefix + json_codec.encode(prompt) + self.suffix
+        return json_codec.encode(self._payload(prompt, temperature, max_tokens))
+
+
+# 服务商返回的限流响应头: (剩余量, 总量)
+_RATE_LIMIT_HEADERS = (
+    ('x-ratelimit-remaining-requests', 'x-ratelimit-limit-requests'),
+    ('x-ratelimit-remaining-tokens', 'x-ratelimit-limit-tokens'),
+    ('anthropic-ratelimit-requests-remaining', 'anthropic-ratelimit-requests-limit'),
+    ('anthropic-ratelimit-tokens-remaining', 'anthropic-ratelimit-tokens-limit'),
+)
+
+
+def _header_number(headers, name: str) -> Optional[float]:
+    """读取数值型响应头，缺失或无法解析时返回None"""
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class _AdaptiveConcurrency:
+    """
+    AIMD并发控制器
+    
+    最近窗口内的平均延迟低于目标时并发上限加1，超过目标或遇到限流/超时时上限减半。
+    """
+    __slots__ = ('limit', 'min_limit', 'max_limit', 'target_latency',
+                 'in_flight', 'latencies', '_condition')
+    
+    def __init__(self, max_limit: int, target_latency: float, window: int = 10):
+        self.limit = max_limit
+        self.min_limit = 1
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self._condition: Optional[asyncio.Condition] = None
+    
+    async def __aenter__(self):
+        # Condition需在事件循环内创建
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    def record(self, latency: float):
+        """记录一次成功调用的延迟并调整并发上限"""
+        self.latencies.append(latency)
+        if sum(self.latencies) / len(self.latencies) > self.target_latency:
+            self.backoff()
+        elif self.limit < self.max_limit:
+            self.limit += 1
+    
+    def backoff(self):
+        """并发上限减半"""
+        self.limit = max(self.min_limit, self.limit // 2)
+
+
+class _CircuitBreaker:
+    """熔断器：时间窗口内失败次数达到阈值后，在冷却期内拒绝调用"""
+    __slots__ = ('threshold', 'window', 'cooldown', 'failures', 'opened_at')
+    
+    def __init__(self, threshold: int = 5, window: float = 30.0, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.failures: Deque[float] = deque()
+        self.opened_at = 0.0
+    
+    def allow(self) -> bool:
+        """是否允许调用；冷却期结束后放行（半开状态），由下一次结果决定是否恢复"""
+        if not self.opened_at:
+            return True
+        return time.monotonic() - self.opened_at >= self.cooldown
+    
+    def record_success(self):
+        """调用成功，关闭熔断"""
+        self.failures.clear()
+        self.opened_at = 0.0
+    
+    def record_failure(self):
+        """记录一次失败，窗口内失败过多时打开熔断"""
+        now = time.monotonic()
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        
+        # 半开状态下试探失败则立即重新熔断
+        if self.opened_at or len(self.failures) >= self.threshold:
+            self.opened_at = now
+
+
 class AIServiceManager:
-    """AI服务管理器"""
+    """
+    AI服务管理器
+    
+    内部持有一个长连接的HTTP会话，建议整个应用只创建一个实例并复用，
+    使后续请求复用已建立的keep-alive连接。
+    """
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, owns_session: bool = True):
         """
         初始化AI服务管理器
         
         Args:
             config_path: 配置文件路径，默认为 .claude/ai-services-config.json
+            owns_session: 退出异步上下文时是否关闭HTTP会话；为False时会话跨多次
+                          上下文复用，需在应用结束时调用 close()
         """
         self.config_path = config_path or ".claude/ai-services-config.json"
         self.config = self._load_config()
-        self.session = None
+        self._index_config()
+        self._build_limiters()
+        self.owns_session = owns_session
+        self.session: Optional[aiohttp.ClientSession] = None
+        
+        # 进行中的请求（相同参数的并发调用共享结果）与最近成功结果的缓存
+        self._inflight: Dict[Tuple, _InflightCall] = {}
+        self._result_cache: 'OrderedDict[Tuple, Tuple[float, AIResponse]]' = OrderedDict()
+        self._result_cache_ttl = self.config.get('global_settings', {}).get('result_cache_ttl', 300)
     
     def _load_config(self) -> Dict:
-        """加载配置文件"""
+        """加载配置文件（文件未修改时复用已解析的配置）"""
+        path = os.path.abspath(self.config_path)
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            mtime = os.stat(path).st_mtime_ns
+            cached = _CONFIG_CACHE.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
+            config = json_codec.load_file(path)
         except FileNotFoundError:
             raise FileNotFoundError(f"配置文件未找到: {self.config_path}")
         except json.JSONDecodeError:
             raise ValueError(f"配置文件格式错误: {self.config_path}")
+        
+        _CONFIG_CACHE[path] = (mtime, config)
+        return config
+    
+    def _index_config(self):
+        """
+        根据配置预先计算常用的派生数据
+        
+        配置字典可能在多个实例间共享，派生数据保存在实例上而不写回配置。
+        """
+        self._headers: Dict[str, Dict[str, str]] = {}
+        self._payload_builders: Dict[Tuple[str, str], _PayloadBuilder] = {}
+        self._free_models: Dict[str, List[str]] = {}
+        self._default_models: Dict[str, str] = {}
+        available = []
+        
+        for service_name, service_config in self.config['services'].items():
+            # 填入API密钥后的完整请求头；请求体为JSON字节串，需显式声明类型
+            api_key = service_config.get('api_key') or ''
+            headers = {key: value.replace('{api_key}', api_key)
+                       for key, value in service_config.get('headers', {}).items()}
+            if not any(key.lower() == 'content-type' for key in headers):
+                headers['Content-Type'] = 'application/json'
+            self._headers[service_name] = headers
+            
+            for model_name, model_config in service_config.get('models', {}).items():
+                self._payload_builders[service_name, model_name] = _PayloadBuilder(
+                    model_name,
+                    model_config.get('temperature', 0.7),
+                    model_config.get('max_tokens', 4096)
+                )
+            
+            # 默认模型：优先使用第一个免费模型，否则使用第一个模型
+            models = service_config.get('models', {})
+            free_list = [model_name for model_name, model_config in models.items()
+                         if model_config.get('type') == 'free']
+            default_model = free_list[0] if free_list else next(iter(models), None)
+            if default_model is not None:
+                self._default_models[service_name] = default_model
+            
+            if not service_config.get('enabled', False):
+                continue
+            
+            if service_config.get('api_key'):
+                available.append(service_name)
+            
+            if free_list:
+                self._free_models[service_name] = free_list
+        
+        self._available_services = tuple(available)
+    
+    def _build_limiters(self):
+        """
+        为每个服务创建限流器
+        
+        服务配置中的 rpm（每分钟请求数，默认60）限制请求频率；
+        配置了 tpm（每分钟token数）时，按请求的 max_tokens 额外限制token用量。
+        max_concurrency（默认8）为并发上限，target_latency（秒，默认15）为AIMD目标延迟。
+        """
+        self._request_buckets: Dict[str, _TokenBucket] = {}
+        self._token_buckets: Dict[str, _TokenBucket] = {}
+        self._concurrency: Dict[str, _AdaptiveConcurrency] = {}
+        self._breakers: Dict[str, _CircuitBreaker] = {}
+        
+        for service_name, service_config in self.config['services'].items():
+            self._concurrency[service_name] = _AdaptiveConcurrency(
+                service_config.get('max_concurrency', 8),
+                service_config.get('target_latency', 15.0)
+            )
+            self._breakers[service_name] = _CircuitBreaker()
+            
+            rpm = service_config.get('rpm', 60)
+            self._request_buckets[service_name] = _TokenBucket(rpm / 60.0, rpm)
+            
+            tpm = service_config.get('tpm')
+            if tpm:
+                self._token_buckets[service_name] = _TokenBucket(tpm / 60.0, tpm)
+    
+    def _apply_rate_limit_headers(self, service_name: str, headers, throttled: bool = False):
+        """
+        根据响应头主动暂停限流器
+        
+        被限流（HTTP 429）或剩余额度很低时，按 retry-after（默认1秒）暂停该服务的请求。
+        """
+        retry_after = _header_number(headers, 'retry-after')
+        
+        if not throttled:
+            for remaining_key, limit_key in _RATE_LIMIT_HEADERS:
+                remaining = _header_number(headers, remaining_key)
+                if remaining is None:
+                    continue
+                limit = _header_number(headers, limit_key)
+                if remaining <= 2 or (limit and remaining / limit < 0.1):
+                    throttled = True
+                    break
+        
+        if throttled:
+            self._request_buckets[service_name].pause_until(time.monotonic() + (retry_after or 1.0))
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取HTTP会话，首次使用时创建（已存在且未关闭时直接复用）"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=32,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True
+            )
+            # 连接阶段单独设置较短超时，不可达的服务尽快失败
+            timeout = aiohttp.ClientTimeout(
+                total=self.config.get('global_settings', {}).get('timeout', 30),
+                sock_connect=5
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+    
+    async def close(self):
+        """关闭HTTP会话"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession()
+        self._get_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器退出"""
-        if self.session:
-            await self.session.close()
+        if self.owns_session:
+            await self.close()
     
     def get_available_services(self) -> List[str]:
         """获取可用的AI服务列表"""
-        return [service for service, config in self.config['services'].items() 
-                if config.get('enabled', False) and config.get('api_key')]
+        return list(self._available_services)
     
     def get_service_models(self, service_name: str) -> List[str]:
         """获取指定服务的模型列表"""
@@ -74,179 +454,173 @@ class AIServiceManager:
     
     def get_free_models(self) -> Dict[str, List[str]]:
         """获取所有免费模型"""
-        free_models = {}
-        for service_name, service_config in self.config['services'].items():
-            if not service_config.get('enabled', False):
-                continue
-            
-            models = service_config.get('models', {})
-            free_list = [model_name for model_name, model_config in models.items() 
-                        if model_config.get('type') == 'free']
-            
-            if free_list:
-                free_models[service_name] = free_list
-        
-        return free_models
+        return {service_name: list(models) for service_name, models in self._free_models.items()}
     
     async def call_ai_service(self, 
                             service_name: str, 
                             model_name: str, 
                             prompt: str, 
                             temperature: float = None,
-                            max_tokens: int = None) -> AIResponse:
+                            max_tokens: int = None,
+                            use_cache: bool = True) -> AIResponse:
         """
         调用指定的AI服务
         
+        参数完全相同的调用会合并：已有相同请求进行中时等待其结果，
+        result_cache_ttl 秒内（global_settings配置，默认300，0为关闭）重复的请求直接返回缓存的成功结果。
+        
         Args:
             service_name: 服务名称 (zhipu, silicon, openai)
             model_name: 模型名称
             prompt: 输入提示词
             temperature: 温度参数
             max_tokens: 最大token数
+            use_cache: 是否使用结果缓存并合并相同请求，False时总是发起新请求（如连通性测试）
             
         Returns:
             AIResponse: AI响应对象
         """
-        import time
-        start_time = time.time()
+        if not use_cache:
+            return await self._call_ai_service(service_name, model_name, prompt, temperature, max_tokens)
         
+        key = (service_name, model_name,
+               hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).digest(),
+               temperature, max_tokens)
+        
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._result_cache.move_to_end(key)
+                return replace(cached[1], response_time=0.0)
+            del self._result_cache[key]
+        
+        # 共享请求在独立任务中执行，任一调用方被取消都不会影响其他调用方
+        call = self._inflight.get(key)
+        if call is None:
+            task = asyncio.ensure_future(
+                self._call_ai_service(service_name, model_name, prompt, temperature, max_tokens))
+            task.add_done_callback(functools.partial(self._finish_call, key))
+            call = self._inflight[key] = _InflightCall(task)
+        
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            # 所有调用方都已放弃时才取消共享请求
+            if not call.waiters and not call.task.done():
+                call.task.cancel()
+    
+    def _finish_call(self, key: Tuple, task: asyncio.Future):
+        """共享请求结束：移出进行中列表，成功结果写入缓存"""
+        call = self._inflight.get(key)
+        if call is not None and call.task is task:
+            del self._inflight[key]
+        
+        if task.cancelled() or task.exception() is not None:
+            return
+        
+        response = task.result()
+        if response.success and self._result_cache_ttl > 0:
+            self._result_cache[key] = (time.monotonic() + self._result_cache_ttl, response)
+            if len(self._result_cache) > _RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+    
+    async def _call_ai_service(self, service_name: str, model_name: str, prompt: str,
+                               temperature: Optional[float], max_tokens: Optional[int]) -> AIResponse:
+        """实际发起AI服务调用"""
         service_config = self.config['services'].get(service_name)
         if not service_config:
-            return AIResponse(
-                service_name=service_name,
-                model_name=model_name,
-                content="",
-                confidence=0.0,
-                token_usage={},
-                response_time=0.0,
-                success=False,
-                error_message=f"未找到服务配置: {service_name}"
-            )
+            return _error_response(service_name, model_name, f"未找到服务配置: {service_name}")
         
         if not service_config.get('enabled', False):
-            return AIResponse(
-                service_name=service_name,
-                model_name=model_name,
-                content="",
-                confidence=0.0,
-                token_usage={},
-                response_time=0.0,
-                success=False,
-                error_message=f"服务未启用: {service_name}"
-            )
+            return _error_response(service_name, model_name, f"服务未启用: {service_name}")
         
-        api_key = service_config.get('api_key')
-        if not api_key:
-            return AIResponse(
-                service_name=service_name,
-                model_name=model_name,
-                content="",
-                confidence=0.0,
-                token_usage={},
-                response_time=0.0,
-                success=False,
-                error_message=f"API密钥未配置: {service_name}"
-            )
+        if not service_config.get('api_key'):
+            return _error_response(service_name, model_name, f"API密钥未配置: {service_name}")
         
-        model_config = service_config.get('models', {}).get(model_name)
-        if not model_config:
-            return AIResponse(
-                service_name=service_name,
-                model_name=model_name,
-                content="",
-                confidence=0.0,
-                token_usage={},
-                response_time=0.0,
-                success=False,
-                error_message=f"未找到模型配置: {model_name}"
-            )
+        builder = self._payload_builders.get((service_name, model_name))
+        if builder is None:
+            return _error_response(service_name, model_name, f"未找到模型配置: {model_name}")
         
-        # 构建请求参数
-        payload = {
-            "model": model_name,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": temperature or model_config.get('temperature', 0.7),
-            "max_tokens": max_tokens or model_config.get('max_tokens', 4096)
-        }
+        # 熔断期间直接返回，不发起网络请求
+        breaker = self._breakers[service_name]
+        if not breaker.allow():
+            return _error_response(service_name, model_name, f"服务已熔断: {service_name} 近期多次调用失败，暂停调用")
         
-        # 构建请求头
-        headers = {}
-        for key, value in service_config.get('headers', {}).items():
-            headers[key] = value.replace('{api_key}', api_key)
+        # 构建请求体
+        max_tokens = max_tokens or builder.max_tokens
+        body = builder.build(prompt, temperature or builder.temperature, max_tokens)
         
-        try:
-            timeout = aiohttp.ClientTimeout(total=self.config.get('global_settings', {}).get('timeout', 30))
-            
-            async with self.session.post(
-                service_config['api_base'],
-                json=payload,
-                headers=headers,
-                timeout=timeout
-            ) as response:
-                response_time = time.time() - start_time
-                
-                if response.status != 200:
-                    error_text = await response.text()
+        # 客户端限流，避免超出服务商频率限制
+        await self._request_buckets[service_name].acquire()
+        token_bucket = self._token_buckets.get(service_name)
+        if token_bucket is not None:
+            await token_bucket.acquire(max_tokens)
+        
+        concurrency = self._concurrency[service_name]
+        async with concurrency:
+            # 从发出请求开始计时，限流和并发排队的等待不计入延迟
+            start_time = time.perf_counter()
+            try:
+                async with self._get_session().post(
+                    service_config['api_base'],
+                    data=body,
+                    headers=self._headers[service_name]
+                ) as response:
+                    response_time = time.perf_counter() - start_time
+                    
+                    if response.status != 200:
+                        # 限流或服务端错误：降低并发并计入熔断统计
+                        if response.status == 429 or response.status >= 500:
+                            concurrency.backoff()
+                            breaker.record_failure()
+                        if response.status == 429:
+                            self._apply_rate_limit_headers(service_name, response.headers, throttled=True)
+                        
+                        error_text = await response.text()
+                        return _error_response(service_name, model_name, f"HTTP {response.status}: {error_text}", response_time)
+                    
+                    # 读取原始字节后直接解码，避免先转成str再交给标准库json解析
+                    result = json_codec.loads(await response.read())
+                    concurrency.record(response_time)
+                    breaker.record_success()
+                    self._apply_rate_limit_headers(service_name, response.headers)
+                    
+                    # 解析响应
+                    content = ""
+                    token_usage = {}
+                    
+                    if 'choices' in result and result['choices']:
+                        content = result['choices'][0].get('message', {}).get('content', '')
+                    
+                    if 'usage' in result:
+                        token_usage = result['usage']
+                    
                     return AIResponse(
                         service_name=service_name,
                         model_name=model_name,
-                        content="",
-                        confidence=0.0,
-                        token_usage={},
+                        content=content,
+                        confidence=8.5,  # 默认置信度
+                        token_usage=token_usage,
                         response_time=response_time,
-                        success=False,
-                        error_message=f"HTTP {response.status}: {error_text}"
+                        success=True
                     )
-                
-                result = await response.json()
-                
-                # 解析响应
-                content = ""
-                token_usage = {}
-                
-                if 'choices' in result and result['choices']:
-                    content = result['choices'][0].get('message', {}).get('content', '')
-                
-                if 'usage' in result:
-                    token_usage = result['usage']
-                
-                return AIResponse(
-                    service_name=service_name,
-                    model_name=model_name,
-                    content=content,
-                    confidence=8.5,  # 默认置信度
-                    token_usage=token_usage,
-                    response_time=response_time,
-                    success=True
-                )
-                
-        except asyncio.TimeoutError:
-            return AIResponse(
-                service_name=service_name,
-                model_name=model_name,
-                content="",
-                confidence=0.0,
-                token_usage={},
-                response_time=time.time() - start_time,
-                success=False,
-                error_message="请求超时"
-            )
-        except Exception as e:
-            return AIResponse(
-                service_name=service_name,
-                model_name=model_name,
-                content="",
-                confidence=0.0,
-                token_usage={},
-                response_time=time.time() - start_time,
-                success=False,
-                error_message=str(e)
-            )
+                    
+            except asyncio.TimeoutError:
+                concurrency.backoff()
+                breaker.record_failure()
+                return _error_response(service_name, model_name, "请求超时", time.perf_counter() - start_time)
+            except Exception as e:
+                breaker.record_failure()
+                return _error_response(service_name, model_name, str(e), time.perf_counter() - start_time)
     
     async def analyze_with_multiple_ai(self, 
                                      prompt: str, 
                                      services: List[str] = None, 
-                                     template_type: str = "analysis") -> List[AIResponse]:
+                                     template_type: str = "analysis",
+                                     quorum: Optional[int] = None,
+                                     max_concurrency: int = 16) -> List[AIResponse]:
         """
         使用多个AI服务进行分析
         
@@ -254,9 +628,11 @@ class AIServiceManager:
             prompt: 分析内容
             services: 要使用的服务列表，默认使用所有可用服务
             template_type: 模板类型 (analysis, code_review, bug_analysis)
+            quorum: 获得指定数量的成功响应后立即返回并取消其余调用，默认等待全部完成
+            max_concurrency: 同时进行的调用数上限
             
         Returns:
-            List[AIResponse]: AI响应列表
+            List[AIResponse]: 已完成调用的AI响应列表（按服务顺序）
         """
         if services is None:
             services = self.get_available_services()
@@ -264,107 +640,104 @@ class AIServiceManager:
         # 获取对应的提示词模板
         template_key = f"{template_type}_template"
         template = self.config.get('prompts', {}).get(template_key, "{content}")
-        formatted_prompt = template.format(content=prompt, language="", code="", error="")
+        formatted_prompt = template.format_map(_BlankFormatDict(content=prompt))
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def bounded_call(service_name: str, model_name: str) -> AIResponse:
+            async with semaphore:
+                return await self.call_ai_service(service_name, model_name, formatted_prompt)
         
         tasks = []
         for service_name in services:
-            # 获取该服务的默认模型
-            models = self.get_service_models(service_name)
-            if not models:
+            model_name = self._default_models.get(service_name)
+            if model_name is None:
                 continue
-                
-            # 优先使用免费模型
-            free_models = [m for m in models 
-                         if self.config['services'][service_name]['models'][m].get('type') == 'free']
-            model_name = free_models[0] if free_models else models[0]
             
-            task = self.call_ai_service(service_name, model_name, formatted_prompt)
-            tasks.append(task)
+            tasks.append(asyncio.ensure_future(bounded_call(service_name, model_name)))
         
         if not tasks:
             return []
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        needed = quorum or len(tasks)
+        succeeded = 0
+        pending = set(tasks)
+        try:
+            while pending and succeeded < needed:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None and task.result().success:
+                        succeeded += 1
+        finally:
+            # 已达到所需数量（或被取消）时，取消仍未完成的调用
+            for task in pending:
+                task.cancel()
         
-        # 处理异常结果
-        valid_results = []
-        for result in results:
-            if isinstance(result, Exception):
-                continue
-            valid_results.append(result)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
         
-        return valid_results
+        # 跳过被取消和抛出异常的调用
+        return [task.result() for task in tasks
+                if not task.cancelled() and task.exception() is None]
     
     def format_ai_responses(self, responses: List[AIResponse]) -> str:
         """格式化AI响应为表格形式"""
         if not responses:
             return "没有获得AI分析结果"
         
-        # 构建表格
-        table_rows = ["| AI服务 | 模型 | 分析结果 | 置信度 | 响应时间 |"]
-        table_rows.append("|--------|------|----------|--------|----------|")
-        
-        for response in responses:
-            if response.success:
-                # 截断内容以适应表格显示
-                content = response.content[:100] + "..." if len(response.content) > 100 else response.content
-                content = content.replace('\n', ' ').replace('|', '\\|')  # 转义表格字符
-                
-                table_rows.append(
-                    f"| {response.service_name} | {response.model_name} | {content} | "
-                    f"{response.confidence:.1f}/10 | {response.response_time:.2f}s |"
-                )
-            else:
-                table_rows.append(
-                    f"| {response.service_name} | {response.model_name} | "
-                    f"错误: {response.error_message} | 0/10 | {response.response_time:.2f}s |"
-                )
-        
-        return "\n".join(table_rows)
+        return "\n".join(chain(_RESPONSE_TABLE_HEADER, map(_response_table_row, responses)))
     
     def get_combined_analysis(self, responses: List[AIResponse]) -> str:
         """获取综合分析结果"""
-        successful_responses = [r for r in responses if r.success]
+        sections = []
+        names = []
+        total_confidence = 0.0
         
-        if not successful_responses:
-            return "所有AI服务调用失败，无法提供分析结果"
+        # 单次遍历同时收集内容、服务名和置信度
+        for r in responses:
+            if r.success:
+                sections.append(f"**{r.service_name} ({r.model_name})**:\n{r.content}")
+                names.append(r.service_name)
+                total_confidence += r.confidence
         
-        # 简单的综合分析逻辑
-        combined_content = "\n\n".join([
-            f"**{r.service_name} ({r.model_name})**:\n{r.content}" 
-            for r in successful_responses
-        ])
+        if not sections:
+            return "所有AI服务调用失败，无法提供分析结果"
         
-        avg_confidence = sum(r.confidence for r in successful_responses) / len(successful_responses)
+        combined_content = "\n\n".join(sections)
+        avg_confidence = total_confidence / len(sections)
         
-        summary = f"""## 综合分析 (基于{len(successful_responses)}个AI服务)
+        summary = f"""## 综合分析 (基于{len(sections)}个AI服务)
 
 {combined_content}
 
 ---
 **平均置信度**: {avg_confidence:.1f}/10
-**参与分析的AI服务**: {', '.join([r.service_name for r in successful_responses])}
+**参与分析的AI服务**: {', '.join(names)}
 """
         
         return summary
 
 
 # 配置管理工具函数
-def setup_ai_service(service_name: str, api_key: str, models: List[str] = None):
-    """配置AI服务"""
+def setup_ai_service(service_name: str, api_key: str, models: List[str] = None) -> Tuple[bool, Optional[Dict]]:
+    """
+    配置AI服务
+    
+    Returns:
+        Tuple[bool, Optional[Dict]]: (是否成功, 写入后的配置)，失败时配置为None
+    """
     config_path = ".claude/ai-services-config.json"
     
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = json_codec.load_file(config_path)
     except FileNotFoundError:
         print(f"配置文件不存在: {config_path}")
-        return False
+        return False, None
     
     if service_name not in config['services']:
         print(f"不支持的服务: {service_name}")
         print(f"支持的服务: {list(config['services'].keys())}")
-        return False
+        return False, None
     
     # 更新配置
     config['services'][service_name]['api_key'] = api_key
@@ -377,14 +750,31 @@ def setup_ai_service(service_name: str, api_key: str, models: List[str] = None):
             if model not in available_models:
                 print(f"警告: 模型 {model} 不在可用列表中: {available_models}")
     
+    # 先写入临时文件再原子替换，写入中断不会损坏原配置
+    # 配置包含API密钥，临时文件仅对所有者可读写，替换前沿用原文件的权限
+    tmp_path = config_path + '.tmp'
     try:
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        mode = stat.S_IMODE(os.stat(config_path).st_mode)
+    except OSError:
+        mode = 0o600
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json_codec.encode(config, indent=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, config_path)
+        _CONFIG_CACHE.pop(os.path.abspath(config_path), None)
         print(f"成功配置 {service_name} 服务")
-        return True
+        return True, config
     except Exception as e:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
         print(f"保存配置失败: {e}")
-        return False
+        return False, None
 
 
 def list_ai_services():
@@ -392,8 +782,7 @@ def list_ai_services():
     config_path = ".claude/ai-services-config.json"
     
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = json_codec.load_file(config_path)
     except FileNotFoundError:
         print(f"配置文件不存在: {config_path}")
         return
@@ -403,8 +792,9 @@ def list_ai_services():
     
     for service_name, service_config in config['services'].items():
         status = "✅ 已启用" if service_config.get('enabled') and service_config.get('api_key') else "❌ 未配置"
-        model_count = len(service_config.get('models', {}))
-        free_count = len([m for m in service_config.get('models', {}).values() if m.get('type') == 'free'])
+        models = service_config.get('models', {})
+        model_count = len(models)
+        free_count = sum(1 for m in models.values() if m.get('type') == 'free')
         
         print(f"服务: {service_config['name']} ({service_name})")
         print(f"状态: {status}")
@@ -426,8 +816,8 @@ if __name__ == "__main__":
             list_ai_services()
         else:
             print("用法:")
-            print("  python ai_service_manager.py setup <service_name> <api_key>")
-            print("  python ai_service_manager.py list")
+            print("  python -m src.ai_service_manager setup <service_name> <api_key>")
+            print("  python -m src.ai_service_manager list")
     else:
         print("AI Service Manager - 多AI服务调用封装类")
         print("支持的命令:")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Event Loop - 事件循环配置
+非Windows平台安装了uvloop时使用uvloop，否则使用asyncio默认事件循环
+"""
+
+import asyncio
+import sys
+from typing import Any, Callable, Coroutine, Optional
+
+
+def _uvloop_factory() -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """返回uvloop事件循环的构造函数，不可用时返回None"""
+    if sys.platform == 'win32':
+        return None
+    
+    try:
+        import uvloop
+    except ImportError:  # uvloop为可选依赖
+        return None
+    
+    return uvloop.new_event_loop
+
+
+def run(main: Coroutine[Any, Any, Any]) -> Any:
+    """
+    运行协程直到完成，可用时使用uvloop事件循环（替代 asyncio.run）
+    
+    Python 3.11+ 通过 asyncio.Runner 的 loop_factory 指定事件循环，
+    不修改全局事件循环策略（该接口在Python 3.14中已弃用）；更早的版本仍通过策略启用uvloop。
+    
+    Args:
+        main: 要运行的协程
+        
+    Returns:
+        Any: 协程的返回值
+    """
+    loop_factory = _uvloop_factory()
+    if loop_factory is None:
+        return asyncio.run(main)
+    
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(main)
+    
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
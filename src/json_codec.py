@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+JSON Codec - JSON编解码封装
+安装了orjson时使用orjson，否则回退到标准库json
+"""
+
+import json
+import mmap
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，调用方统一捕获后者即可
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """解析JSON文本或字节串"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path: Union[str, os.PathLike]) -> Any:
+    """
+    解析JSON文件
+    
+    安装了orjson时通过mmap直接解析文件内容，省去读入和解码的复制。
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if not orjson or size == 0:
+            # 空文件无法mmap，交给loads报告格式错误
+            with os.fdopen(os.dup(fd), 'rb') as f:
+                return loads(f.read())
+        
+        with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+    finally:
+        os.close(fd)
+
+
+def encode(obj: Any, indent: bool = False) -> bytes:
+    """
+    序列化为UTF-8编码的JSON字节串
+    
+    Args:
+        obj: 要序列化的对象
+        indent: 是否使用2空格缩进，默认输出紧凑格式
+    """
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """
+    序列化为JSON字符串（保留非ASCII字符）
+    
+    Args:
+        obj: 要序列化的对象
+        indent: 是否使用2空格缩进
+    """
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False)
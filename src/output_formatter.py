@@ -4,11 +4,151 @@ Output Formatter - AI输出格式化Agent
 负责将多个AI服务的输出统一格式化为指定样式
 """
 
-import json
 import re
-from typing import List, Dict, Any, Optional
+import string
+import time
+from datetime import datetime
+from operator import attrgetter
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, NamedTuple, Callable, TextIO, Tuple
+from collections import OrderedDict
 from dataclasses import dataclass
-from ai_service_manager import AIResponse
+from . import json_codec
+from .ai_service_manager import AIResponse, AIServiceManager
+
+
+# 连续空行（包括只含空白字符的行）
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+# Markdown代码块标记
+_CODE_FENCE = '```'
+# 表格字符转义
+_PIPE_ESCAPE = str.maketrans({'|': '\\|'})
+# 预览内容中的换行替换为空格
+_NEWLINE_TO_SPACE = str.maketrans({'\n': ' '})
+
+# 固定的表头、标题和提示文本
+_ANALYSIS_TABLE_HEADER = (
+    "| AI服务 | 模型 | 状态 | 分析结果预览 | 置信度 | 响应时间 |\n"
+    "|--------|------|------|-------------|--------|----------|"
+)
+_SECTION_SEPARATOR = "\n\n---\n\n"
+_OVERVIEW_HEADING = "## 📋 分析概览\n\n"
+_SUCCESS_HEADING = "## ✅ 成功分析结果\n\n"
+_FAILURE_HEADING = "## ❌ 失败调用信息\n\n"
+_ALL_FAILED_SECTION = "## ⚠️ 分析失败\n\n所有AI服务调用均失败，无法提供分析结果。"
+_NO_ANALYSIS_DATA = "无AI分析数据"
+_NO_RESPONSE_DATA = "无AI响应数据"
+
+# 响应是否调用成功
+_IS_SUCCESS = attrgetter('success')
+
+# 服务显示名称，未列出的服务使用首字母大写的服务名
+_SERVICE_DISPLAY_NAMES = {
+    "zhipu": "智谱轻言",
+    "silicon": "硅基流动",
+    "openai": "OpenAI",
+    "claude": "Claude"
+}
+# 综合分析中各结果前的服务标签
+_SERVICE_LABELS = {key: f"**[{name}]**: " for key, name in _SERVICE_DISPLAY_NAMES.items()}
+
+
+def _has_more_lines_than(content: str, count: int) -> bool:
+    """内容中的换行符是否多于count个，找到第count+1个后即停止扫描"""
+    index = -1
+    for _ in range(count + 1):
+        index = content.find('\n', index + 1)
+        if index == -1:
+            return False
+    return True
+
+
+# 默认的单个AI响应模板
+_DEFAULT_AI_RESPONSE_TEMPLATE = "[{ai_name}]: {response}"
+# AI响应模板支持的占位符及其参数位置
+_AI_RESPONSE_FIELDS = {"ai_name": 0, "response": 1}
+
+
+def _compile_ai_response_template(template: str) -> Callable[[str, str], str]:
+    """
+    预先解析AI响应模板，返回 (ai_name, response) -> str 的渲染函数
+    
+    模板只包含不带格式说明的 {ai_name}、{response} 占位符时，渲染时直接拼接各段；
+    其他模板回退到 str.format，行为与逐次调用 format 相同。
+    """
+    if template == _DEFAULT_AI_RESPONSE_TEMPLATE:
+        return lambda ai_name, response: f"[{ai_name}]: {response}"
+    
+    segments = []
+    try:
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+            index = _AI_RESPONSE_FIELDS.get(field_name) if field_name is not None else None
+            if field_name is not None and (index is None or format_spec or conversion):
+                raise ValueError(field_name)
+            segments.append((literal, index))
+    except ValueError:
+        return lambda ai_name, response: template.format(ai_name=ai_name, response=response)
+    
+    def render(ai_name: str, response: str) -> str:
+        values = (ai_name, response)
+        return "".join([literal if index is None else literal + values[index]
+                        for literal, index in segments])
+    
+    return render
+
+
+# 样式配置文件不存在时使用的默认配置
+_DEFAULT_STYLE_CONFIG = {
+    "settings": {
+        "output_format": {
+            "ai_output_prefix": "[{ai_name}]: ",
+            "use_tables": True,
+            "section_headers": True,
+            "code_blocks": True
+        }
+    },
+    "templates": {
+        "analysis_output": "| AI服务 | 模型 | 分析结果 | 置信度 |\n|--------|------|----------|--------|\n| {ai_name} | {model} | {analysis} | {confidence} |",
+        "ai_response": _DEFAULT_AI_RESPONSE_TEMPLATE,
+        "summary_format": "## 综合分析\n\n{combined_analysis}\n\n## 建议操作\n\n{recommendations}"
+    }
+}
+
+
+class _StyleSettings(NamedTuple):
+    """从样式配置中读取的格式化设置"""
+    use_tables: bool
+    render_ai_response: Callable[[str, str], str]
+
+
+# 每个格式化器缓存的内容清理/截断结果数
+_TEXT_CACHE_SIZE = 32
+
+
+def _clean_text(content: str) -> str:
+    """清理内容格式"""
+    # 移除多余的空行
+    content = _BLANK_LINES_RE.sub('\n\n', content.strip())
+    # 处理表格字符转义（大多数内容不含'|'，无需复制）
+    if '|' in content:
+        content = content.translate(_PIPE_ESCAPE)
+    return content
+
+
+def _truncate_text(content: str, max_length: int) -> str:
+    """截断内容并将换行替换为空格"""
+    if len(content) <= max_length:
+        # 不含换行的短内容直接返回原字符串
+        if '\n' not in content:
+            return content
+        return content.translate(_NEWLINE_TO_SPACE)
+    
+    return content[:max_length].translate(_NEWLINE_TO_SPACE) + "..."
+
+
+class _ResponseView(NamedTuple):
+    """AI响应及其预先计算的显示名称，供各输出段复用"""
+    response: AIResponse
+    display_name: str
 
 
 @dataclass
@@ -30,30 +170,52 @@ class OutputFormatter:
             style_config_path: 输出样式配置文件路径
         """
         self.style_config_path = style_config_path or ".claude/output-styles/AI整合助手.json"
-        self.style_config = self._load_style_config()
+        # 样式配置在首次使用时才加载
+        self._style_config: Optional[Dict] = None
+        self._style_settings: Optional[_StyleSettings] = None
+        
+        # 最近一次生成的时间戳及其对应的秒数
+        self._timestamp_second = -1
+        self._timestamp = ""
+        
+        # 内容清理和截断结果的缓存（仅本实例使用，容量有限）
+        self._clean_cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._truncate_cache: 'OrderedDict[Tuple[str, int], str]' = OrderedDict()
+    
+    @property
+    def style_config(self) -> Dict:
+        """输出样式配置，首次访问时加载"""
+        if self._style_config is None:
+            self._style_config = self._load_style_config()
+        return self._style_config
+    
+    @style_config.setter
+    def style_config(self, config: Dict):
+        """替换样式配置，下次格式化时重新读取配置项"""
+        self._style_config = config
+        self._style_settings = None
+    
+    @property
+    def _settings(self) -> _StyleSettings:
+        """格式化时用到的样式配置项，首次使用时读取一次"""
+        if self._style_settings is None:
+            config = self.style_config
+            output_format = config.get("settings", {}).get("output_format", {})
+            self._style_settings = _StyleSettings(
+                output_format.get("use_tables", True),
+                _compile_ai_response_template(
+                    config.get("templates", {}).get("ai_response", _DEFAULT_AI_RESPONSE_TEMPLATE)
+                )
+            )
+        return self._style_settings
     
     def _load_style_config(self) -> Dict:
         """加载输出样式配置"""
         try:
-            with open(self.style_config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return json_codec.load_file(self.style_config_path)
         except FileNotFoundError:
             # 返回默认配置
-            return {
-                "settings": {
-                    "output_format": {
-                        "ai_output_prefix": "[{ai_name}]: ",
-                        "use_tables": True,
-                        "section_headers": True,
-                        "code_blocks": True
-                    }
-                },
-                "templates": {
-                    "analysis_output": "| AI服务 | 模型 | 分析结果 | 置信度 |\n|--------|------|----------|--------|\n| {ai_name} | {model} | {analysis} | {confidence} |",
-                    "ai_response": "[{ai_name}]: {response}",
-                    "summary_format": "## 综合分析\n\n{combined_analysis}\n\n## 建议操作\n\n{recommendations}"
-                }
-            }
+            return _DEFAULT_STYLE_CONFIG
     
     def format_single_ai_response(self, response: AIResponse) -> str:
         """
@@ -65,13 +227,8 @@ class OutputFormatter:
         Returns:
             str: 格式化后的输出
         """
-        template = self.style_config.get("templates", {}).get("ai_response", "[{ai_name}]: {response}")
-        
         if not response.success:
-            return template.format(
-                ai_name=response.service_name,
-                response=f"调用失败: {response.error_message}"
-            )
+            return self._settings.render_ai_response(response.service_name, f"调用失败: {response.error_message}")
         
         # 处理输出内容
         content = self._clean_content(response.content)
@@ -79,10 +236,7 @@ class OutputFormatter:
         # 添加置信度和响应时间信息
         metadata = f" (置信度: {response.confidence:.1f}/10, 响应时间: {response.response_time:.2f}s)"
         
-        return template.format(
-            ai_name=response.service_name,
-            response=content + metadata
-        )
+        return self._settings.render_ai_response(response.service_name, content + metadata)
     
     def format_analysis_table(self, responses: List[AIResponse]) -> str:
         """
@@ -95,32 +249,34 @@ class OutputFormatter:
             str: 表格格式的分析结果
         """
         if not responses:
-            return "无AI分析数据"
+            return _NO_ANALYSIS_DATA
         
-        # 表格头部
-        table_lines = [
-            "| AI服务 | 模型 | 状态 | 分析结果预览 | 置信度 | 响应时间 |",
-            "|--------|------|------|-------------|--------|----------|"
-        ]
+        return self._format_table(self._response_views(responses))
+    
+    def _response_views(self, responses: List[AIResponse]) -> List[_ResponseView]:
+        """为每个响应计算一次显示名称"""
+        return [_ResponseView(response, self._get_service_display_name(response.service_name))
+                for response in responses]
+    
+    def _format_table(self, views: List[_ResponseView]) -> str:
+        """根据预先计算的响应视图生成分析表格"""
+        table_lines = [_ANALYSIS_TABLE_HEADER]
         
-        for response in responses:
-            service_name = self._get_service_display_name(response.service_name)
-            model_name = response.model_name
-            
+        for response, service_name in views:
             if response.success:
                 status = "✅ 成功"
                 preview = self._truncate_content(response.content, 50)
-                confidence = f"{response.confidence:.1f}/10"
+                confidence = format(response.confidence, '.1f') + "/10"
             else:
                 status = "❌ 失败"
                 preview = response.error_message or "未知错误"
                 confidence = "0/10"
             
-            response_time = f"{response.response_time:.2f}s"
+            response_time = format(response.response_time, '.2f') + "s"
             
-            table_lines.append(
-                f"| {service_name} | {model_name} | {status} | {preview} | {confidence} | {response_time} |"
-            )
+            table_lines.append("| " + " | ".join(
+                (service_name, response.model_name, status, preview, confidence, response_time)
+            ) + " |")
         
         return "\n".join(table_lines)
     
@@ -135,7 +291,7 @@ class OutputFormatter:
             str: 详细格式化的响应内容
         """
         if not responses:
-            return "无AI响应数据"
+            return _NO_RESPONSE_DATA
         
         sections = []
         
@@ -161,7 +317,7 @@ class OutputFormatter:
             
             sections.append(section)
         
-        return "\n\n---\n\n".join(sections)
+        return _SECTION_SEPARATOR.join(sections)
     
     def format_combined_analysis(self, responses: List[AIResponse]) -> str:
         """
@@ -173,20 +329,54 @@ class OutputFormatter:
         Returns:
             str: 综合分析格式化输出
         """
-        successful_responses = [r for r in responses if r.success]
-        failed_responses = [r for r in responses if not r.success]
+        return "".join(self.iter_combined_analysis(responses))
+    
+    def write_combined_analysis(self, fp: TextIO, responses: List[AIResponse]):
+        """
+        将综合分析结果逐段写入文本流，不在内存中拼接完整输出
+        
+        Args:
+            fp: 可写的文本流（如 sys.stdout 或以文本模式打开的文件）
+            responses: AI响应列表
+        """
+        fp.writelines(self.iter_combined_analysis(responses))
+    
+    def iter_combined_analysis(self, responses: List[AIResponse]) -> Iterator[str]:
+        """
+        逐段生成综合分析结果，便于边生成边输出
+        
+        Args:
+            responses: AI响应列表
+            
+        Yields:
+            str: 综合分析的各个段落
+        """
+        # 显示名称只计算一次，表格和各结果段共用
+        views = self._response_views(responses)
+        
+        # 单次遍历完成分组和统计累加
+        successful_views = []
+        failed_views = []
+        total_confidence = 0.0
+        total_response_time = 0.0
+        for view in views:
+            r = view.response
+            if r.success:
+                successful_views.append(view)
+                total_confidence += r.confidence
+                total_response_time += r.response_time
+            else:
+                failed_views.append(view)
         
-        if not successful_responses:
-            return "## ⚠️ 分析失败\n\n所有AI服务调用均失败，无法提供分析结果。"
+        if not successful_views:
+            yield _ALL_FAILED_SECTION
+            return
         
         # 统计信息
         total_services = len(responses)
-        success_count = len(successful_responses)
-        avg_confidence = sum(r.confidence for r in successful_responses) / len(successful_responses)
-        avg_response_time = sum(r.response_time for r in successful_responses) / len(successful_responses)
-        
-        # 构建综合分析
-        analysis_parts = []
+        success_count = len(successful_views)
+        avg_confidence = total_confidence / success_count
+        avg_response_time = total_response_time / success_count
         
         # 头部统计
         stats_section = f"""## 📊 分析统计
@@ -200,37 +390,42 @@ class OutputFormatter:
 | 平均响应时间 | {avg_response_time:.2f}s |
 
 """
-        analysis_parts.append(stats_section)
+        yield stats_section
         
         # 快速概览表格
-        if self.style_config.get("settings", {}).get("output_format", {}).get("use_tables", True):
-            table_section = "## 📋 分析概览\n\n" + self.format_analysis_table(responses) + "\n\n"
-            analysis_parts.append(table_section)
+        if self._settings.use_tables:
+            table_section = _OVERVIEW_HEADING + self._format_table(views) + "\n\n"
+            yield table_section
         
         # 成功的分析结果
-        if successful_responses:
-            success_section = "## ✅ 成功分析结果\n\n"
-            for response in successful_responses:
-                service_name = self._get_service_display_name(response.service_name)
-                success_section += f"**[{service_name}]**: {self._truncate_content(response.content, 200)}\n\n"
-            analysis_parts.append(success_section)
+        if successful_views:
+            success_parts = [_SUCCESS_HEADING]
+            for response, service_name in successful_views:
+                label = _SERVICE_LABELS.get(response.service_name) or f"**[{service_name}]**: "
+                success_parts.append(label + self._truncate_content(response.content, 200) + "\n\n")
+            yield "".join(success_parts)
         
         # 失败的调用信息
-        if failed_responses:
-            fail_section = "## ❌ 失败调用信息\n\n"
-            for response in failed_responses:
-                service_name = self._get_service_display_name(response.service_name)
-                fail_section += f"**[{service_name}]**: {response.error_message}\n\n"
-            analysis_parts.append(fail_section)
+        if failed_views:
+            fail_parts = [_FAILURE_HEADING]
+            for response, service_name in failed_views:
+                label = _SERVICE_LABELS.get(response.service_name) or f"**[{service_name}]**: "
+                fail_parts.append(f"{label}{response.error_message}\n\n")
+            yield "".join(fail_parts)
         
         # 综合建议
-        if len(successful_responses) >= 2:
-            recommendations = self._generate_recommendations(successful_responses)
+        if success_count >= 2:
+            recommendations = self._generate_recommendations([view.response for view in successful_views])
             if recommendations:
                 rec_section = f"## 🎯 综合建议\n\n{recommendations}\n\n"
-                analysis_parts.append(rec_section)
-        
-        return "".join(analysis_parts)
+                yield rec_section
+    
+    # 格式类型 -> 格式化方法，未知类型使用综合格式
+    _FORMATTERS = {
+        "table": format_analysis_table,
+        "detailed": format_detailed_responses,
+        "combined": format_combined_analysis
+    }
     
     def format_for_claude_code(self, responses: List[AIResponse], format_type: str = "combined") -> FormattedOutput:
         """
@@ -243,16 +438,11 @@ class OutputFormatter:
         Returns:
             FormattedOutput: 格式化输出对象
         """
-        if format_type == "table":
-            content = self.format_analysis_table(responses)
-        elif format_type == "detailed":
-            content = self.format_detailed_responses(responses)
-        else:  # combined
-            content = self.format_combined_analysis(responses)
+        content = self._FORMATTERS.get(format_type, OutputFormatter.format_combined_analysis)(self, responses)
         
         metadata = {
             "total_responses": len(responses),
-            "successful_responses": len([r for r in responses if r.success]),
+            "successful_responses": sum(map(_IS_SUCCESS, responses)),
             "format_type": format_type,
             "timestamp": self._get_timestamp()
         }
@@ -265,34 +455,42 @@ class OutputFormatter:
     
     def _get_service_display_name(self, service_name: str) -> str:
         """获取服务显示名称"""
-        name_mapping = {
-            "zhipu": "智谱轻言",
-            "silicon": "硅基流动",
-            "openai": "OpenAI",
-            "claude": "Claude"
-        }
-        return name_mapping.get(service_name, service_name.title())
+        return _SERVICE_DISPLAY_NAMES.get(service_name) or service_name.title()
     
     def _clean_content(self, content: str) -> str:
-        """清理内容格式"""
-        # 移除多余的空行
-        content = re.sub(r'\n\s*\n', '\n\n', content.strip())
-        # 处理表格字符转义
-        content = content.replace('|', '\\|')
-        return content
+        """清理内容格式，相同内容重复格式化时返回缓存结果"""
+        cache = self._clean_cache
+        result = cache.get(content)
+        if result is None:
+            result = cache[content] = _clean_text(content)
+            if len(cache) > _TEXT_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(content)
+        return result
     
     def _truncate_content(self, content: str, max_length: int) -> str:
-        """截断内容"""
-        if len(content) <= max_length:
-            return content.replace('\n', ' ')
-        
-        truncated = content[:max_length].replace('\n', ' ')
-        return truncated + "..."
+        """截断内容，相同参数重复截断时返回缓存结果"""
+        cache = self._truncate_cache
+        key = (content, max_length)
+        result = cache.get(key)
+        if result is None:
+            result = cache[key] = _truncate_text(content, max_length)
+            if len(cache) > _TEXT_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return result
+    
+    def clear_caches(self):
+        """清空本格式化器的内容清理和截断结果缓存"""
+        self._clean_cache.clear()
+        self._truncate_cache.clear()
     
     def _format_content_with_blocks(self, content: str) -> str:
         """格式化内容，包含代码块处理"""
         # 检测是否包含代码
-        if '```' in content or content.count('\n') > 10:
+        if _CODE_FENCE in content or _has_more_lines_than(content, 10):
             return f"```\n{content}\n```"
         return content
     
@@ -315,33 +513,46 @@ class OutputFormatter:
         if len(responses) < 2:
             return ""
         
-        # 简单的建议生成逻辑
-        high_confidence = [r for r in responses if r.confidence >= 8.0]
-        medium_confidence = [r for r in responses if 6.0 <= r.confidence < 8.0]
+        # 单次遍历统计各类响应数量
+        first_service = responses[0].service_name
+        high_count = medium_count = fast_count = 0
+        multi_service = False
+        for r in responses:
+            confidence = r.confidence
+            if confidence >= 8.0:
+                high_count += 1
+            elif 6.0 <= confidence < 8.0:
+                medium_count += 1
+            if r.response_time < 2.0:
+                fast_count += 1
+            if r.service_name != first_service:
+                multi_service = True
         
         recommendations = []
         
-        if high_confidence:
-            rec = f"- 高置信度分析 ({len(high_confidence)}个): 建议优先采纳这些建议"
+        if high_count:
+            rec = f"- 高置信度分析 ({high_count}个): 建议优先采纳这些建议"
             recommendations.append(rec)
         
-        if medium_confidence:
-            rec = f"- 中等置信度分析 ({len(medium_confidence)}个): 可作为参考补充"
+        if medium_count:
+            rec = f"- 中等置信度分析 ({medium_count}个): 可作为参考补充"
             recommendations.append(rec)
         
-        if len(set(r.service_name for r in responses)) >= 2:
+        if multi_service:
             recommendations.append("- 多服务验证: 建议结合多个AI意见做最终决策")
         
-        fast_responses = [r for r in responses if r.response_time < 2.0]
-        if fast_responses:
-            recommendations.append(f"- 快速响应服务 ({len(fast_responses)}个): 适合后续快速迭代使用")
+        if fast_count:
+            recommendations.append(f"- 快速响应服务 ({fast_count}个): 适合后续快速迭代使用")
         
         return "\n".join(recommendations) if recommendations else ""
     
     def _get_timestamp(self) -> str:
-        """获取时间戳"""
-        from datetime import datetime
-        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        """获取时间戳（精确到秒，同一秒内复用已格式化的字符串）"""
+        second = int(time.time())
+        if second != self._timestamp_second:
+            self._timestamp_second = second
+            self._timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        return self._timestamp
 
 
 class AIIntegrationAgent:
@@ -355,8 +566,6 @@ class AIIntegrationAgent:
             config_path: AI服务配置文件路径
             style_path: 输出样式配置文件路径
         """
-        from ai_service_manager import AIServiceManager
-        
         self.service_manager = AIServiceManager(config_path)
         self.formatter = OutputFormatter(style_path)
         self.session_active = False
@@ -383,24 +592,17 @@ class AIIntegrationAgent:
         Returns:
             FormattedOutput: 格式化的分析结果
         """
-        prompt = f"""请对以下{language}代码进行全面分析：
-
-```{language}
-{code}
-```
-
-请从以下角度进行分析：
-1. 代码质量和规范性
-2. 性能优化建议
-3. 安全性检查
-4. 可维护性评估
-5. 潜在问题识别
-
-请提供具体的改进建议和最佳实践推荐。"""
-        
-        responses = await self.service_manager.analyze_with_multiple_ai(prompt, template_type="code_review")
+        responses = await self.service_manager.analyze_with_multiple_ai(
+            self._code_prompt(code, language), template_type="code_review")
         return self.formatter.format_for_claude_code(responses, "combined")
     
+    async def analyze_code_stream(self, code: str, language: str = "python") -> AsyncIterator[str]:
+        """代码分析，逐段产出综合分析结果"""
+        responses = await self.service_manager.analyze_with_multiple_ai(
+            self._code_prompt(code, language), template_type="code_review")
+        for section in self.formatter.iter_combined_analysis(responses):
+            yield section
+    
     async def analyze_error(self, error_message: str, code: str = "", language: str = "python") -> FormattedOutput:
         """
         错误分析
@@ -413,25 +615,17 @@ class AIIntegrationAgent:
         Returns:
             FormattedOutput: 格式化的分析结果
         """
-        prompt = f"""请分析以下错误：
-
-错误信息：
-{error_message}
-
-相关代码：
-```{language}
-{code}
-```
-
-请提供：
-1. 错误根本原因分析
-2. 具体解决方案
-3. 预防措施建议
-4. 相关最佳实践"""
-        
-        responses = await self.service_manager.analyze_with_multiple_ai(prompt, template_type="bug_analysis")
+        responses = await self.service_manager.analyze_with_multiple_ai(
+            self._error_prompt(error_message, code, language), template_type="bug_analysis")
         return self.formatter.format_for_claude_code(responses, "combined")
     
+    async def analyze_error_stream(self, error_message: str, code: str = "", language: str = "python") -> AsyncIterator[str]:
+        """错误分析，逐段产出综合分析结果"""
+        responses = await self.service_manager.analyze_with_multiple_ai(
+            self._error_prompt(error_message, code, language), template_type="bug_analysis")
+        for section in self.formatter.iter_combined_analysis(responses):
+            yield section
+    
     async def general_analysis(self, content: str, analysis_type: str = "general") -> FormattedOutput:
         """
         通用分析
@@ -446,6 +640,47 @@ class AIIntegrationAgent:
         responses = await self.service_manager.analyze_with_multiple_ai(content, template_type="analysis")
         return self.formatter.format_for_claude_code(responses, "combined")
     
+    async def general_analysis_stream(self, content: str) -> AsyncIterator[str]:
+        """通用分析，逐段产出综合分析结果"""
+        responses = await self.service_manager.analyze_with_multiple_ai(content, template_type="analysis")
+        for section in self.formatter.iter_combined_analysis(responses):
+            yield section
+    
+    def _code_prompt(self, code: str, language: str) -> str:
+        """构建代码分析提示词"""
+        return f"""请对以下{language}代码进行全面分析：
+
+```{language}
+{code}
+```
+
+请从以下角度进行分析：
+1. 代码质量和规范性
+2. 性能优化建议
+3. 安全性检查
+4. 可维护性评估
+5. 潜在问题识别
+
+请提供具体的改进建议和最佳实践推荐。"""
+    
+    def _error_prompt(self, error_message: str, code: str, language: str) -> str:
+        """构建错误分析提示词"""
+        return f"""请分析以下错误：
+
+错误信息：
+{error_message}
+
+相关代码：
+```{language}
+{code}
+```
+
+请提供：
+1. 错误根本原因分析
+2. 具体解决方案
+3. 预防措施建议
+4. 相关最佳实践"""
+    
     def get_service_status(self) -> Dict[str, Any]:
         """获取服务状态"""
         available_services = self.service_manager.get_available_services()
@@ -463,6 +698,7 @@ class AIIntegrationAgent:
 if __name__ == "__main__":
     # 测试示例
     import asyncio
+    import sys
     
     async def test_formatter():
         """测试输出格式化器"""
@@ -493,8 +729,7 @@ if __name__ == "__main__":
         print(result.content)
     
     if len(sys.argv) > 1 and sys.argv[1] == "test":
-        import sys
         asyncio.run(test_formatter())
     else:
         print("Output Formatter - AI输出格式化Agent")
-        print("使用 'python output_formatter.py test' 运行测试")
\ No newline at end of file
+        print("使用 'python -m src.output_formatter test' 运行测试")
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""守护进程模式的套接字往返测试"""
+
+import asyncio
+import contextlib
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("aiofiles")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_assistant_cli  # noqa: E402
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(asyncio, "start_unix_server"), reason="需要UNIX套接字支持"
+)
+
+CONFIG_TEMPLATE = (
+    Path(__file__).resolve().parent.parent / ".claude" / "ai-services-config.json.template"
+)
+
+
+async def _wait_for_socket(socket_path: Path, timeout: float = 5.0):
+    """等待守护进程创建套接字文件"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not socket_path.exists():
+        if loop.time() > deadline:
+            raise TimeoutError(f"守护进程未在 {timeout} 秒内启动")
+        await asyncio.sleep(0.01)
+
+
+def test_daemon_round_trip(tmp_path, monkeypatch, capsys):
+    """守护进程执行命令并将输出和退出码返回给客户端"""
+    config_dir = tmp_path / ".claude"
+    config_dir.mkdir()
+    shutil.copy(CONFIG_TEMPLATE, config_dir / "ai-services-config.json")
+    monkeypatch.chdir(tmp_path)
+    socket_path = tmp_path / "daemon.sock"
+    
+    async def scenario():
+        server = asyncio.ensure_future(ai_assistant_cli.serve_daemon(socket_path))
+        try:
+            await _wait_for_socket(socket_path)
+            capsys.readouterr()
+            return await ai_assistant_cli.send_to_daemon(["list"], socket_path=socket_path)
+        finally:
+            server.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await server
+    
+    exit_code = asyncio.run(scenario())
+    
+    assert exit_code == 0
+    output = capsys.readouterr().out
+    assert "AI整合助手 - 服务状态" in output
+    assert "(zhipu)" in output
+    assert not socket_path.exists()
+
+
+def test_daemon_without_reply(tmp_path):
+    """守护进程未回复即断开时视为不可用"""
+    socket_path = tmp_path / "daemon.sock"
+    
+    async def close_immediately(reader, writer):
+        writer.close()
+    
+    async def scenario():
+        server = await asyncio.start_unix_server(close_immediately, path=str(socket_path))
+        async with server:
+            return await ai_assistant_cli.send_to_daemon(["list"], socket_path=socket_path)
+    
+    assert asyncio.run(scenario()) is None
+
+
+def test_daemon_not_running(tmp_path):
+    """套接字不存在时返回None以便回退到直接执行"""
+    result = asyncio.run(ai_assistant_cli.send_to_daemon(["list"], socket_path=tmp_path / "missing.sock"))
+    assert result is None